@@ -4,15 +4,25 @@
 # - Images -> OCR directly
 # - Returns unified JSON with blocks, tables (best-effort), metadata, and per-field confidences
 
-import io
 import os
-import sys
+import asyncio
+import hashlib
 import math
-import tempfile
-from typing import List, Optional, Any, Dict
-
+import queue
+import threading
+import statistics
+import collections
+import contextlib
+import multiprocessing
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Any, AsyncIterator, Dict, Iterator, Tuple
+
+import aiofiles.tempfile
+import numpy as np
+import orjson
+from PIL import UnidentifiedImageError
 from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -31,6 +41,14 @@ except Exception:
     PADDLE_OK = False
     _paddle_singleton = None
 
+# Parallelism comes from the OCR worker processes; keep Tesseract's OpenMP to one
+# thread per worker so N workers don't run N x cores threads. libgomp reads this
+# once when it loads, so it must be set before tesserocr is imported; the
+# tesseract CLI run by pytesseract inherits it. PaddleOCR sizes its own threads
+# (cpu_threads) and Tesseract is only used without it, so leave it alone then.
+if not PADDLE_OK:
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 # Tesseract fallback
 TESSERACT_OK = True
 try:
@@ -39,6 +57,31 @@ try:
 except Exception:
     TESSERACT_OK = False
 
+# tesserocr keeps the Tesseract engine loaded in-process; preferred over
+# pytesseract, which spawns the tesseract CLI for every page
+TESSEROCR_OK = True
+try:
+    import tesserocr
+    from PIL import Image
+    _tess_api_singleton = None
+except Exception:
+    TESSEROCR_OK = False
+    _tess_api_singleton = None
+
+# Optional rate limiting of extraction jobs
+AIOLIMITER_OK = True
+try:
+    from aiolimiter import AsyncLimiter
+except Exception:
+    AIOLIMITER_OK = False
+
+# Optional JIT for the Tesseract TSV -> block conversion
+NUMBA_OK = True
+try:
+    from numba import njit
+except Exception:
+    NUMBA_OK = False
+
 # Optional table extraction with pdfplumber (born-digital only best-effort)
 PLUMBER_OK = True
 try:
@@ -46,7 +89,89 @@ try:
 except Exception:
     PLUMBER_OK = False
 
-app = FastAPI(title="NovaAgent OCR Service", version="1.0.0")
+# orjson serializes the large block lists far faster than the stdlib encoder
+app = FastAPI(title="NovaAgent OCR Service", version="1.0.0", default_response_class=ORJSONResponse)
+
+
+def _cuda_device_count() -> int:
+    if not PADDLE_OK:
+        return 0
+    try:
+        import paddle
+        return paddle.device.cuda.device_count() if paddle.device.is_compiled_with_cuda() else 0
+    except Exception:
+        return 0
+
+
+# Scanned pages are OCR'd in parallel worker processes (one engine per worker).
+# On GPU that is one worker per device, not per core, or the models alone
+# exhaust GPU memory.
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS") or _cuda_device_count() or os.cpu_count() or 1))
+# CPU threads each worker's PaddleOCR instance may use
+OCR_CPU_THREADS = max(1, (os.cpu_count() or 1) // OCR_WORKERS)
+# Pages sent to a worker per task; amortizes dispatch/IPC and caps memory per task
+OCR_BATCH_SIZE = max(1, int(os.getenv("OCR_BATCH_SIZE", "4")))
+# Tesseract: LSTM engine only, page treated as one uniform block of text,
+# fed a pre-binarized image (pixels below the threshold become black)
+TESSERACT_OEM = 1
+TESSERACT_PSM = 6
+TESSERACT_CONFIG = f"--oem {TESSERACT_OEM} --psm {TESSERACT_PSM}"
+_BINARIZE_LUT = [0 if x < 155 else 255 for x in range(256)]
+
+# PaddleOCR inference precision: fp32 (default), fp16, or int8 (needs quantized models)
+OCR_PRECISION = os.getenv("OCR_PRECISION", "fp32").lower()
+if OCR_PRECISION not in ("fp32", "fp16", "int8"):
+    OCR_PRECISION = "fp32"
+
+# Rendered batches buffered ahead of OCR for a scanned PDF
+OCR_PREFETCH_BATCHES = 2
+_ocr_pool: Optional[ProcessPoolExecutor] = None
+_ocr_pool_lock = threading.Lock()
+# GPU this worker process runs PaddleOCR on (set by _init_ocr_worker)
+_ocr_gpu_id = 0
+
+# Rasterization for OCR: OCR_DPI by default, OCR_DENSE_DPI for pages whose
+# text layer has a small median font size, never more than OCR_MAX_PIXELS
+OCR_DPI = int(os.getenv("OCR_DPI", "150"))
+OCR_DENSE_DPI = int(os.getenv("OCR_DENSE_DPI", "200"))
+OCR_SMALL_FONT_PT = 9.0
+OCR_MAX_PIXELS = 2000 * 2000
+
+# A PDF is treated as born-digital above this much selectable text
+# (characters per page / 1000, see _page_text_ratio)
+DIGITAL_TEXT_RATIO = 0.1
+
+# Uploads processed concurrently. Each one runs in a thread, off the event
+# loop, and the heavy OCR is fanned out to the process pool. PyMuPDF is not
+# thread-safe, so all fitz calls go through _fitz_lock; they also hold the GIL,
+# so large digital PDFs still slow the event loop while they parse.
+OCR_MAX_CONCURRENT = max(1, int(os.getenv("OCR_MAX_CONCURRENT", str(os.cpu_count() or 1))))
+_extract_executor = ThreadPoolExecutor(max_workers=OCR_MAX_CONCURRENT, thread_name_prefix="extract")
+_extract_semaphore = asyncio.Semaphore(OCR_MAX_CONCURRENT)
+_fitz_lock = threading.Lock()
+
+# Extraction jobs started per second (0 = no limit; needs aiolimiter), and
+# retries with exponential backoff when an OCR worker dies (e.g. OOM-killed)
+# or memory runs out; bad input fails the same way every time, so it is not retried
+OCR_RATE_LIMIT = float(os.getenv("OCR_RATE_LIMIT", "0"))
+_extract_limiter = None
+if AIOLIMITER_OK and OCR_RATE_LIMIT > 0:
+    # AsyncLimiter rejects acquiring more than max_rate at once, so rates below
+    # one per second are expressed as one job per 1/rate seconds instead
+    _extract_limiter = AsyncLimiter(max(1.0, OCR_RATE_LIMIT), max(1.0, OCR_RATE_LIMIT) / OCR_RATE_LIMIT)
+OCR_RETRIES = 3
+OCR_RETRY_BACKOFF = 0.5
+
+# Uploads are spooled to disk in chunks of this size rather than read whole
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Serialized results of recent extractions keyed by content hash, so re-uploads
+# of the same document skip parsing/OCR. Least recently used entries are
+# evicted once the cached bodies exceed OCR_CACHE_MB in total.
+OCR_CACHE_MAX_BYTES = max(0, int(os.getenv("OCR_CACHE_MB", "256"))) * 1024 * 1024
+OCR_CACHE_MAX_FILE_BYTES = 100 * 1024 * 1024
+_result_cache: "collections.OrderedDict[Tuple[str, str, bool], bytes]" = collections.OrderedDict()
+_result_cache_bytes = 0
 
 
 # -----------------------------
@@ -66,40 +191,185 @@ class ExtractResponse(BaseModel):
 # -----------------------------
 # Utilities
 # -----------------------------
+def _get_tess_api() -> Optional["tesserocr.PyTessBaseAPI"]:
+    # One handle per process; only used from pool workers, which are single-threaded
+    global _tess_api_singleton
+    if not TESSEROCR_OK:
+        return None
+    if _tess_api_singleton is None:
+        _tess_api_singleton = tesserocr.PyTessBaseAPI(lang="eng", psm=TESSERACT_PSM, oem=TESSERACT_OEM)
+    return _tess_api_singleton
+
+
+def _paddle_use_gpu() -> bool:
+    return _cuda_device_count() > 0
+
+
 def _get_paddle() -> Optional["PaddleOCR"]:
     global _paddle_singleton
     if not PADDLE_OK:
         return None
     if _paddle_singleton is None:
-        # English, angle cls on, det+rec
-        _paddle_singleton = PaddleOCR(use_angle_cls=True, lang="en")
+        # English, angle cls on, det+rec. PaddleOCR defaults to 10 CPU threads per
+        # instance; split the cores between the OCR workers instead.
+        _paddle_singleton = PaddleOCR(
+            use_angle_cls=True, lang="en", cpu_threads=OCR_CPU_THREADS, **_paddle_precision_kwargs()
+        )
     return _paddle_singleton
 
 
-def _page_text_ratio(doc: "fitz.Document") -> float:
-    """Rough heuristic: how much selectable text exists vs pixels (0..1)."""
+def _paddle_precision_kwargs() -> Dict[str, Any]:
+    """Device/precision options for PaddleOCR, driven by OCR_PRECISION."""
+    use_gpu = _paddle_use_gpu()
+    kwargs: Dict[str, Any] = {"use_gpu": use_gpu}
+    if use_gpu:
+        kwargs["gpu_id"] = _ocr_gpu_id
+    if OCR_PRECISION == "fp32":
+        return kwargs
+    kwargs["precision"] = OCR_PRECISION
+    if use_gpu:
+        # Paddle Inference applies reduced precision on GPU through TensorRT
+        kwargs["use_tensorrt"] = True
+    else:
+        # On CPU, oneDNN runs "fp16" as bfloat16
+        kwargs["enable_mkldnn"] = True
+    return kwargs
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            # With fork, workers inherit the PaddleOCR weights warmed at startup
+            # (copy-on-write). A CUDA context does not survive fork, so GPU builds
+            # and platforms without fork spawn fresh workers instead; either way the
+            # initializer makes sure each worker loads its engine exactly once.
+            use_fork = "fork" in multiprocessing.get_all_start_methods() and not _paddle_use_gpu()
+            ctx = multiprocessing.get_context("fork" if use_fork else "spawn")
+            # Each GPU worker takes a rank once at startup, which picks its device.
+            # Only built for GPU pools: filling a Queue starts a feeder thread,
+            # and CPU pools must fork while the process is single-threaded.
+            ranks = None
+            if _paddle_use_gpu():
+                ranks = ctx.Queue()
+                for rank in range(OCR_WORKERS):
+                    ranks.put(rank)
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS, mp_context=ctx, initializer=_init_ocr_worker, initargs=(ranks,)
+            )
+        return _ocr_pool
+
+
+def _init_ocr_worker(ranks: Optional["multiprocessing.Queue[int]"]) -> None:
+    global _ocr_gpu_id
+    devices = _cuda_device_count()
+    if ranks is not None and devices:
+        _ocr_gpu_id = ranks.get() % devices
+    _get_paddle()
+
+
+def _reset_ocr_pool_if_broken() -> None:
+    """Replace the OCR pool if a worker died abruptly (e.g. OOM-killed)."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            return
+        try:
+            # A broken pool refuses new work; a healthy one just gets a no-op task
+            _ocr_pool.submit(int)
+        except BrokenExecutor:
+            _ocr_pool.shutdown(wait=False, cancel_futures=True)
+            _ocr_pool = None
+
+
+def _page_text_ratio(doc: "fitz.Document", threshold: float = DIGITAL_TEXT_RATIO) -> float:
+    """Rough heuristic: how much selectable text exists vs pixels (0..1).
+
+    Stops reading pages once the ratio is certain to exceed `threshold`; the
+    value returned is then a partial count, but still above the threshold.
+    """
     try:
-        chars = sum(len(page.get_text("text")) for page in doc)
+        with _fitz_lock:
+            page_count = doc.page_count
         # Pages*some constant to avoid division by zero
-        denom = max(1, doc.page_count) * 1000
+        denom = max(1, page_count) * 1000
+        chars = 0
+        for pno in range(page_count):
+            # Locked per page, so other uploads get a turn between pages
+            with _fitz_lock:
+                chars += len(doc.load_page(pno).get_text("text"))
+            if chars / denom > threshold:
+                break
         return min(1.0, chars / denom)
     except Exception:
         return 0.0
 
 
-def _pixmap_to_pil(pix: "fitz.Pixmap") -> "Image.Image":
-    # Convert PyMuPDF pixmap to PIL Image (RGB)
-    data = pix.tobytes("png")
-    return Image.open(io.BytesIO(data)).convert("RGB")
+class _PageBufferRing:
+    """Reusable uint8 page buffers, handed out round-robin.
+
+    A slot is reused `size` pages after it was taken, so `size` must cover
+    every page that can still be waiting on OCR at once. Slots start empty
+    and grow to the largest page they have held.
+    """
+
+    def __init__(self, size: int):
+        self._slots = [np.empty(0, dtype=np.uint8) for _ in range(size)]
+        self._next = 0
+
+    def take(self, shape: Tuple[int, ...]) -> np.ndarray:
+        n = math.prod(shape)
+        i = self._next
+        self._next = (i + 1) % len(self._slots)
+        if self._slots[i].size < n:
+            self._slots[i] = np.empty(n, dtype=np.uint8)
+        return self._slots[i][:n].reshape(shape)
+
+
+def _pixmap_to_ndarray(pix: "fitz.Pixmap", buffers: _PageBufferRing) -> np.ndarray:
+    # Pixmaps are rendered with alpha=False; grayscale ones come back as plain
+    # HxW so PIL reads them as mode "L"
+    shape = (pix.height, pix.width) if pix.n == 1 else (pix.height, pix.width, pix.n)
+    # Copy straight out of the pixmap's memory into a reused buffer
+    arr = buffers.take(shape)
+    np.copyto(arr, np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(shape))
+    return arr
+
+
+def _page_zoom(page: "fitz.Page", target_dpi: int) -> float:
+    """Pick the render zoom for a page: denser DPI for small print, capped in pixels."""
+    dpi = target_dpi
+    # flags=0 leaves out image blocks, so this stays cheap on scanned pages
+    sizes = [
+        span["size"]
+        for block in page.get_text("dict", flags=0).get("blocks", [])
+        for line in block.get("lines", [])
+        for span in line.get("spans", [])
+    ]
+    if sizes and statistics.median(sizes) < OCR_SMALL_FONT_PT:
+        dpi = max(dpi, OCR_DENSE_DPI)
+    zoom = dpi / 72.0
+    # Oversized pages (plan sets, posters) are scaled down to the pixel budget
+    pixels = page.rect.width * page.rect.height * zoom * zoom
+    if pixels > OCR_MAX_PIXELS:
+        zoom *= math.sqrt(OCR_MAX_PIXELS / pixels)
+    return zoom
+
+
+def _render_page(doc: "fitz.Document", pno: int, target_dpi: int, buffers: _PageBufferRing) -> np.ndarray:
+    # PaddleOCR wants 3 channels; Tesseract binarizes anyway, so give it gray
+    colorspace = fitz.csRGB if PADDLE_OK else fitz.csGRAY
+    with _fitz_lock:
+        page = doc.load_page(pno)
+        zoom = _page_zoom(page, target_dpi)
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+        return _pixmap_to_ndarray(pix, buffers)
 
 
-def _ocr_image_paddle(img: "Image.Image") -> List[Dict[str, Any]]:
+def _ocr_ndarray_paddle(arr: np.ndarray) -> List[Dict[str, Any]]:
     ocr = _get_paddle()
     if not ocr:
         return []
-    # Paddle expects numpy array (BGR) under the hood; PIL is fine via np.asarray
-    import numpy as np
-    arr = np.array(img)
     result = ocr.ocr(arr, cls=True)
     blocks = []
     # result is list per image, each with lines
@@ -114,39 +384,139 @@ def _ocr_image_paddle(img: "Image.Image") -> List[Dict[str, Any]]:
     return blocks
 
 
-def _ocr_image_tesseract(img: "Image.Image") -> List[Dict[str, Any]]:
-    if not TESSERACT_OK:
+def _binarize(img: "Image.Image") -> "Image.Image":
+    # Hand Tesseract a 1-bit page so it skips its own Otsu/Leptonica thresholding
+    bands = img.getbands()
+    if bands == ("1",):
+        return img
+    gray = img if bands == ("L",) else img.convert("L")
+    return gray.point(_BINARIZE_LUT, "1")
+
+
+def _ocr_image_tesserocr(img: "Image.Image") -> List[Dict[str, Any]]:
+    api = _get_tess_api()
+    if not api:
         return []
-    # Use tesseract TSV to get boxes + conf
-    tsv = pytesseract.image_to_data(img, output_type=pytesseract.Output.DICT)
+    api.SetImage(img)
+    api.Recognize()
+    it = api.GetIterator()
+    if it is None:
+        return []
+    level = tesserocr.RIL.WORD
     blocks = []
-    for i in range(len(tsv["text"])):
-        txt = tsv["text"][i]
+    for word in tesserocr.iterate_level(it, level):
+        txt = word.GetUTF8Text(level)
         if not txt or txt.strip() == "":
             continue
-        try:
-            conf = float(tsv["conf"][i])
-        except:
-            conf = -1.0
-        x, y, w, h = tsv["left"][i], tsv["top"][i], tsv["width"][i], tsv["height"][i]
+        conf = word.Confidence(level)
         blocks.append({
             "text": txt,
             "confidence": conf / 100.0 if conf > 1 else 0.0,
-            "bbox": [x, y, x + w, y + h]
+            "bbox": list(word.BoundingBox(level))
         })
     return blocks
 
 
+def _ocr_image_tesseract(img: "Image.Image") -> List[Dict[str, Any]]:
+    if not (TESSEROCR_OK or TESSERACT_OK):
+        return []
+    img = _binarize(img)
+    if TESSEROCR_OK:
+        return _ocr_image_tesserocr(img)
+    # Use tesseract TSV to get boxes + conf
+    tsv = pytesseract.image_to_data(img, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    # Work on whole columns at once rather than word by word
+    keep = np.flatnonzero(np.char.str_len(np.char.strip(np.asarray(tsv["text"], dtype=str))) > 0)
+    if keep.size == 0:
+        return []
+    try:
+        conf = np.asarray(tsv["conf"], dtype=np.float64)[keep]
+    except ValueError:
+        conf = np.array([_parse_conf(tsv["conf"][i]) for i in keep], dtype=np.float64)
+    left, top, width, height = (
+        np.asarray(tsv[k], dtype=np.int64)[keep] for k in ("left", "top", "width", "height")
+    )
+    bboxes, conf = _pack_tsv(left, top, width, height, conf)
+    return [
+        {"text": tsv["text"][i], "confidence": c, "bbox": bbox}
+        for i, c, bbox in zip(keep.tolist(), conf.tolist(), bboxes.tolist())
+    ]
+
+
+if NUMBA_OK:
+    @njit(cache=True)
+    def _pack_tsv(left, top, width, height, conf):
+        # Compiled: one pass building [x1, y1, x2, y2] boxes and 0..1 confidences
+        n = left.shape[0]
+        bboxes = np.empty((n, 4), dtype=np.int64)
+        scores = np.empty(n, dtype=np.float64)
+        for i in range(n):
+            bboxes[i, 0] = left[i]
+            bboxes[i, 1] = top[i]
+            bboxes[i, 2] = left[i] + width[i]
+            bboxes[i, 3] = top[i] + height[i]
+            scores[i] = conf[i] / 100.0 if conf[i] > 1 else 0.0
+        return bboxes, scores
+else:
+    def _pack_tsv(left, top, width, height, conf):
+        bboxes = np.stack([left, top, left + width, top + height], axis=1)
+        return bboxes, np.where(conf > 1, conf / 100.0, 0.0)
+
+
+def _parse_conf(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return -1.0
+
+
+def _ocr_page(arr: np.ndarray) -> List[Dict[str, Any]]:
+    """OCR one HxW (gray) or HxWx3 (RGB) page array. Runs inside a pool worker process."""
+    # Prefer PaddleOCR, fallback to Tesseract (which is fed a PIL image)
+    blocks = _ocr_ndarray_paddle(arr) if PADDLE_OK else []
+    if not blocks and (TESSEROCR_OK or TESSERACT_OK):
+        blocks = _ocr_image_tesseract(Image.fromarray(arr))
+    return blocks
+
+
+def _ocr_pages(batch: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+    """OCR a batch of page arrays in one worker task, in order."""
+    return [_ocr_page(arr) for arr in batch]
+
+
 def _merge_blocks_to_text(blocks: List[Dict[str, Any]]) -> str:
     return " ".join(b["text"] for b in blocks if b.get("text"))
 
 
-def _extract_tables_plumber(file_bytes: bytes) -> List[Dict[str, Any]]:
+def _extract_tables_fitz(doc: "fitz.Document") -> List[Dict[str, Any]]:
+    # Reuses the already-open document instead of parsing the PDF a second time
+    tables_out = []
+    with _fitz_lock:
+        page_count = doc.page_count
+    for p_idx in range(page_count):
+        try:
+            # Locked per page, so other uploads get a turn between pages
+            with _fitz_lock:
+                page_rows = [t.extract() for t in doc.load_page(p_idx).find_tables().tables]
+        except Exception:
+            continue
+        for rows in page_rows:
+            matrix = [[(cell or "").strip() for cell in row] for row in rows] if rows else []
+            if matrix:
+                tables_out.append({
+                    "page": p_idx + 1,
+                    "rows": matrix,
+                    "strategy": "pymupdf"
+                })
+    return tables_out
+
+
+def _extract_tables_plumber(path: str) -> List[Dict[str, Any]]:
     if not PLUMBER_OK:
         return []
     tables_out = []
     try:
-        with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+        with pdfplumber.open(path) as pdf:
             for p_idx, page in enumerate(pdf.pages):
                 try:
                     # Try multiple extraction strategies
@@ -174,65 +544,116 @@ def _extract_tables_plumber(file_bytes: bytes) -> List[Dict[str, Any]]:
     return tables_out
 
 
-def _extract_digital_pdf(doc: "fitz.Document") -> Dict[str, Any]:
-    text_all = []
-    blocks_all: List[Dict[str, Any]] = []
-    meta_tables: List[Dict[str, Any]] = []
+# get_text("dict") flags without TEXT_PRESERVE_IMAGES, so image bytes are not extracted
+_DICT_TEXT_FLAGS = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
 
-    for pno in range(doc.page_count):
-        page = doc.load_page(pno)
-        text = page.get_text("text")
-        text_all.append(text)
 
-        # Word-level geometry
-        dict_content = page.get_text("dict")
+def _iter_digital_pdf_pages(doc: "fitz.Document") -> Iterator[Dict[str, Any]]:
+    """Yield {"page", "text", "blocks"} for each page of a born-digital PDF."""
+    with _fitz_lock:
+        page_count = doc.page_count
+    for pno in range(page_count):
+        # One parse per page: both the plain text and the span geometry come
+        # from the same "dict" output (images skipped, they carry no text)
+        with _fitz_lock:
+            dict_content = doc.load_page(pno).get_text("dict", flags=_DICT_TEXT_FLAGS)
+        page_text_parts: List[str] = []
+        page_blocks: List[Dict[str, Any]] = []
         for block in dict_content.get("blocks", []):
             for line in block.get("lines", []):
                 for span in line.get("spans", []):
+                    page_text_parts.append(span["text"])
                     bbox = [span["bbox"][0], span["bbox"][1], span["bbox"][2], span["bbox"][3]]
-                    blocks_all.append({
+                    page_blocks.append({
                         "text": span["text"],
                         "confidence": 1.0,  # digital text, assume perfect
                         "bbox": bbox,
                         "page": pno + 1
                     })
+                page_text_parts.append("\n")
+        yield {"page": pno + 1, "text": "".join(page_text_parts), "blocks": page_blocks}
+
+
+def _render_batches(
+    doc: "fitz.Document", target_dpi: int, buffers: _PageBufferRing, out: "queue.Queue[Any]", stop: threading.Event
+) -> None:
+    """Producer for _iter_scanned_pdf_pages: puts page batches, then None (or the error)."""
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-    return {
-        "text": "\n".join(text_all),
-        "blocks": blocks_all,
-        "tables": meta_tables  # may be filled by pdfplumber separately
-    }
-
-
-def _extract_scanned_pdf(doc: "fitz.Document") -> Dict[str, Any]:
-    blocks_all: List[Dict[str, Any]] = []
-    texts: List[str] = []
-
-    for pno in range(doc.page_count):
-        page = doc.load_page(pno)
-        # Render at 200-300 DPI for OCR (scale factor ~2 to 3)
-        mat = fitz.Matrix(2, 2)
-        pix = page.get_pixmap(matrix=mat, alpha=False)
-        if "Image" not in sys.modules:
-            from PIL import Image  # lazy
-        img = _pixmap_to_pil(pix)
-
-        # Prefer PaddleOCR, fallback to Tesseract
-        blocks = _ocr_image_paddle(img) if PADDLE_OK else []
-        if not blocks and TESSERACT_OK:
-            blocks = _ocr_image_tesseract(img)
-
-        page_text = _merge_blocks_to_text(blocks)
-        texts.append(page_text)
+    try:
+        with _fitz_lock:
+            page_count = doc.page_count
+        for start in range(0, page_count, OCR_BATCH_SIZE):
+            batch = [
+                _render_page(doc, pno, target_dpi, buffers)
+                for pno in range(start, min(start + OCR_BATCH_SIZE, page_count))
+            ]
+            if not put(batch):
+                return
+    except Exception as e:
+        put(e)
+        return
+    put(None)
+
+
+def _ocr_page_records(page_blocks: List[List[Dict[str, Any]]], first_page: int) -> Iterator[Dict[str, Any]]:
+    for pno, blocks in enumerate(page_blocks, start=first_page):
         for b in blocks:
-            b["page"] = pno + 1
-        blocks_all.extend(blocks)
-
-    return {
-        "text": "\n".join(texts),
-        "blocks": blocks_all,
-        "tables": []  # OCR-only: table detection could be added via PP-Structure if needed
-    }
+            b["page"] = pno
+        yield {"page": pno, "text": _merge_blocks_to_text(blocks), "blocks": blocks}
+
+
+def _iter_scanned_pdf_pages(doc: "fitz.Document", target_dpi: int = OCR_DPI) -> Iterator[Dict[str, Any]]:
+    """Yield {"page", "text", "blocks"} for each page of a scanned PDF, in page order."""
+    # A producer thread rasterizes batches of OCR_BATCH_SIZE pages into a small
+    # bounded queue while this thread keeps the worker pool busy, and at most a
+    # few batches are held in memory at a time. MuPDF holds the GIL while
+    # rendering, so the overlap comes from OCR running in the worker processes,
+    # not from the two threads here running in parallel.
+    batches: "queue.Queue[Any]" = queue.Queue(maxsize=OCR_PREFETCH_BATCHES)
+    # Pages are rendered into reused buffers. While batch N is being rendered,
+    # batches up to N - (prefetch + workers + 2) have finished OCR (queue
+    # bound + in-flight window below), so a ring of that many batches is
+    # never overwritten while a worker still needs the pixels.
+    buffers = _PageBufferRing((OCR_PREFETCH_BATCHES + OCR_WORKERS + 2) * OCR_BATCH_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_render_batches, args=(doc, target_dpi, buffers, batches, stop), name="rasterize", daemon=True
+    )
+    producer.start()
+
+    pool = _get_ocr_pool()
+    in_flight: "collections.deque[Any]" = collections.deque()
+    done = 0
+    try:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                break
+            if isinstance(batch, BaseException):
+                raise batch
+            if len(in_flight) >= OCR_WORKERS:
+                page_blocks = in_flight.popleft().result()
+                yield from _ocr_page_records(page_blocks, done + 1)
+                done += len(page_blocks)
+            in_flight.append(pool.submit(_ocr_pages, batch))
+        # Collect in submission order so page numbers line up
+        while in_flight:
+            page_blocks = in_flight.popleft().result()
+            yield from _ocr_page_records(page_blocks, done + 1)
+            done += len(page_blocks)
+    finally:
+        stop.set()
+        producer.join()
+        for fut in in_flight:
+            fut.cancel()
 
 
 def _guess_mime(name: str) -> str:
@@ -244,75 +665,351 @@ def _guess_mime(name: str) -> str:
     return "application/octet-stream"
 
 
+async def _spool_upload(file: UploadFile) -> Tuple[str, str, int]:
+    """Stream an upload to a temp file chunk by chunk.
+
+    Returns (path, sha256 hex digest, size in bytes); the digest is computed
+    on the fly so the file is only read once.
+    """
+    suffix = os.path.splitext(file.filename or "")[1]
+    digest = hashlib.sha256()
+    size = 0
+    path = None
+    try:
+        async with aiofiles.tempfile.NamedTemporaryFile("wb", suffix=suffix, delete=False) as tmp:
+            path = tmp.name
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await tmp.write(chunk)
+    except BaseException:
+        # delete=False keeps the file around; drop a partial upload (or a
+        # cancelled request's) here since no caller ever gets its path
+        if path is not None:
+            _discard(path)
+        raise
+    return path, digest.hexdigest(), size
+
+
+def _cache_get(key: Tuple[str, str, bool]) -> Optional[bytes]:
+    body = _result_cache.get(key)
+    if body is not None:
+        _result_cache.move_to_end(key)
+    return body
+
+
+def _cache_put(key: Tuple[str, str, bool], body: bytes) -> None:
+    global _result_cache_bytes
+    if len(body) > OCR_CACHE_MAX_BYTES:
+        return
+    old = _result_cache.pop(key, None)
+    if old is not None:
+        _result_cache_bytes -= len(old)
+    _result_cache[key] = body
+    _result_cache_bytes += len(body)
+    while _result_cache_bytes > OCR_CACHE_MAX_BYTES:
+        _, evicted = _result_cache.popitem(last=False)
+        _result_cache_bytes -= len(evicted)
+
+
+def _with_file_name(body: bytes, fname: str) -> bytes:
+    # Cached bodies are stored without file_name, which differs per upload;
+    # splice it back in as the first key, where _do_extract puts it
+    return b'{"file_name":' + orjson.dumps(fname) + b"," + body[1:]
+
+
+def _extract_error(fname: str) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """(status_code, JSON body) when an upload cannot be extracted at all, else None."""
+    mime = _guess_mime(fname)
+    if mime == "image" and not (PADDLE_OK or TESSEROCR_OK or TESSERACT_OK):
+        return 500, {"error": "No OCR engine available (install paddleocr or tesseract)."}
+    if mime not in ("application/pdf", "image"):
+        return 400, {"error": f"Unsupported file type for {fname}"}
+    return None
+
+
+@contextlib.contextmanager
+def _open_pdf(path: str) -> Iterator["fitz.Document"]:
+    # Opening from a path lets MuPDF read the file lazily instead of holding it in memory
+    with _fitz_lock:
+        doc = fitz.open(path, filetype="pdf")
+    try:
+        yield doc
+    finally:
+        with _fitz_lock:
+            doc.close()
+
+
+def _iter_extract(path: str, fname: str, want_tables: bool) -> Iterator[Dict[str, Any]]:
+    """Blocking, page-by-page extraction of one spooled upload.
+
+    Yields a "document" record (type, page count, engine) first, then one
+    "page" record per page in order, then a "tables" record for digital PDFs.
+    """
+    mime = _guess_mime(fname)
+
+    if mime == "application/pdf":
+        with _open_pdf(path) as doc:
+            ratio = _page_text_ratio(doc)
+            is_digital = ratio > DIGITAL_TEXT_RATIO
+            with _fitz_lock:
+                page_count = doc.page_count
+            yield {
+                "type": "document",
+                "file_name": fname,
+                "mime_type": mime,
+                "pages": page_count,
+                "is_digital_pdf": is_digital,
+                "metadata": {"engine": "pymupdf" if is_digital else "ocr"},
+            }
+
+            if is_digital:
+                for page in _iter_digital_pdf_pages(doc):
+                    yield {"type": "page", **page}
+                tables: List[Dict[str, Any]] = []
+                if want_tables:
+                    tables = _extract_tables_fitz(doc)
+                    # pdfplumber's text strategy still catches tables drawn without ruling lines
+                    if not tables and PLUMBER_OK:
+                        tables = _extract_tables_plumber(path)
+                yield {"type": "tables", "tables": tables}
+            else:
+                for page in _iter_scanned_pdf_pages(doc):
+                    yield {"type": "page", **page}
+                # TODO: If you want OCR-based table detection, swap in PaddleOCR PP-Structure here.
+
+    elif mime == "image":
+        # Direct image OCR
+        yield {
+            "type": "document",
+            "file_name": fname,
+            "mime_type": mime,
+            "pages": 1,
+            "is_digital_pdf": None,
+            "metadata": {"engine": "ocr"},
+        }
+        with Image.open(path) as img:
+            arr = np.asarray(img.convert("RGB" if PADDLE_OK else "L"))
+        blk = _get_ocr_pool().submit(_ocr_page, arr).result()
+        yield from ({"type": "page", **page} for page in _ocr_page_records([blk], 1))
+
+
+def _do_extract(path: str, fname: str, want_tables: bool) -> Tuple[int, Dict[str, Any]]:
+    """Blocking extraction for one spooled upload. Returns (status_code, JSON body)."""
+    error = _extract_error(fname)
+    if error is not None:
+        return error
+
+    document: Dict[str, Any] = {}
+    texts: List[str] = []
+    blocks: List[Dict[str, Any]] = []
+    tables: List[Dict[str, Any]] = []
+    try:
+        for record in _iter_extract(path, fname, want_tables):
+            if record["type"] == "document":
+                document = record
+            elif record["type"] == "page":
+                texts.append(record["text"])
+                blocks.extend(record["blocks"])
+            elif record["type"] == "tables":
+                tables = record["tables"]
+    except UnidentifiedImageError:
+        return 400, {"error": f"Could not read image {fname}"}
+
+    # Same shape as ExtractResponse, built directly: every field is produced
+    # here with known types, so pydantic validation of the blocks is skipped
+    return 200, {
+        "file_name": fname,
+        "mime_type": document["mime_type"],
+        "pages": document["pages"],
+        "is_digital_pdf": document["is_digital_pdf"],
+        "text": "\n".join(texts),
+        "blocks": blocks,
+        "tables": tables,
+        "metadata": document["metadata"],
+    }
+
+
+async def _extract_spooled(
+    path: str, digest: str, size: int, fname: str, want_tables: bool
+) -> Tuple[int, bytes]:
+    """Extract one spooled upload, served from the result cache when possible.
+    Removes the spooled file. Returns (status_code, serialized JSON body)."""
+    # The cache only has to be consulted and filled from the event loop, so it needs no lock
+    cache_key = (digest, _guess_mime(fname), want_tables)
+    cacheable = size <= OCR_CACHE_MAX_FILE_BYTES
+    cached = _cache_get(cache_key) if cacheable else None
+    if cached is not None:
+        _discard(path)
+        return 200, _with_file_name(cached, fname)
+
+    # Parsing and OCR are blocking; run them off the event loop and cap how
+    # many uploads are processed at once.
+    try:
+        status, content = await _run_extract_job(_do_extract, path, fname, want_tables)
+    finally:
+        _discard(path)
+    if status != 200:
+        return status, orjson.dumps(content)
+    content.pop("file_name")
+    body = orjson.dumps(content)
+    if cacheable:
+        _cache_put(cache_key, body)
+    return status, _with_file_name(body, fname)
+
+
+def _discard(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def _run_extract_job(fn: Any, *args: Any) -> Any:
+    """Run a blocking extraction call on the executor, behind the concurrency
+    cap and rate limit, retrying transient failures with exponential backoff."""
+    loop = asyncio.get_running_loop()
+    delay = OCR_RETRY_BACKOFF
+    for attempt in range(OCR_RETRIES + 1):
+        async with _extract_semaphore:
+            if _extract_limiter is not None:
+                await _extract_limiter.acquire()
+            try:
+                return await loop.run_in_executor(_extract_executor, fn, *args)
+            except (BrokenExecutor, MemoryError) as e:
+                if attempt == OCR_RETRIES:
+                    raise
+                pool_broken = isinstance(e, BrokenExecutor)
+        # Back off without holding a slot so other uploads can proceed
+        if pool_broken:
+            _reset_ocr_pool_if_broken()
+        await asyncio.sleep(delay)
+        delay *= 2
+
+
+async def _stream_extract(path: str, fname: str, want_tables: bool) -> AsyncIterator[bytes]:
+    """NDJSON body for /extract/stream: one _iter_extract record per line."""
+    loop = asyncio.get_running_loop()
+    records = _iter_extract(path, fname, want_tables)
+    try:
+        async with _extract_semaphore:
+            # A stream cannot be replayed once started, so it is rate limited but not retried
+            if _extract_limiter is not None:
+                await _extract_limiter.acquire()
+            while True:
+                # Each step is blocking (page parse or OCR wait), so advance the generator off the loop
+                record = await loop.run_in_executor(_extract_executor, next, records, None)
+                if record is None:
+                    break
+                yield orjson.dumps(record) + b"\n"
+    except Exception as e:
+        if isinstance(e, BrokenExecutor):
+            # Replace the dead pool so the next request does not fail the same way
+            _reset_ocr_pool_if_broken()
+        # Headers are already sent; report the failure in-band. The exception
+        # text can name the spooled temp file, so it is not sent to the client.
+        yield orjson.dumps({"type": "error", "error": f"Extraction failed for {fname}"}) + b"\n"
+    finally:
+        try:
+            await loop.run_in_executor(_extract_executor, records.close)
+        except ValueError:
+            # Still running in the executor after a client disconnect; it is
+            # closed when that step finishes and the generator is collected
+            pass
+        _discard(path)
+
+
+async def _stream_batch(spooled: List[Tuple[str, str, str, int]], want_tables: bool) -> AsyncIterator[bytes]:
+    """NDJSON body for /batch: one result line per file, in completion order.
+
+    Files run concurrently; _extract_semaphore (OCR_MAX_CONCURRENT) bounds how
+    many are actually being extracted at once, shared with other requests.
+    """
+    async def run(index: int, fname: str, path: str, digest: str, size: int) -> bytes:
+        try:
+            status, body = await _extract_spooled(path, digest, size, fname, want_tables)
+        except Exception:
+            # Not str(e): the exception text can name the spooled temp file
+            status, body = 500, orjson.dumps({"error": f"Extraction failed for {fname}"})
+        # The result body is already serialized; splice it in rather than re-encode it
+        head = orjson.dumps({"index": index, "file_name": fname, "status": status})
+        return head[:-1] + b',"result":' + body + b"}\n"
+
+    tasks = [asyncio.ensure_future(run(i, *item)) for i, item in enumerate(spooled)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away: stop pending work and drop files that never started
+        for task in tasks:
+            task.cancel()
+        for _, path, _, _ in spooled:
+            _discard(path)
+
+
 # -----------------------------
 # Routes
 # -----------------------------
+@app.on_event("startup")
+def _warm_up_ocr():
+    # GPU pools spawn their workers, which load their own models; a copy in the
+    # parent would only hold GPU memory
+    if _paddle_use_gpu():
+        return
+    # Load the PaddleOCR models, then fork the workers now, while the process is
+    # still single-threaded, rather than from a request thread later on
+    _get_paddle()
+    _get_ocr_pool().submit(int)
+
+
 @app.get("/health")
 def health():
-    return {"ok": True, "paddle": PADDLE_OK, "tesseract": TESSERACT_OK, "pdfplumber": PLUMBER_OK}
+    return {
+        "ok": True,
+        "paddle": PADDLE_OK,
+        "tesseract": TESSERACT_OK,
+        "tesserocr": TESSEROCR_OK,
+        "pdfplumber": PLUMBER_OK,
+    }
 
 
-@app.post("/extract", response_model=ExtractResponse)
+# ExtractResponse documents the body in OpenAPI only; it is not used to validate responses
+@app.post("/extract", responses={200: {"model": ExtractResponse}})
 async def extract(file: UploadFile = File(...), want_tables: Optional[bool] = Form(default=True)):
-    file_bytes = await file.read()
     fname = file.filename or "uploaded"
-    mime = _guess_mime(fname)
+    path, digest, size = await _spool_upload(file)
+    status, body = await _extract_spooled(path, digest, size, fname, bool(want_tables))
+    return Response(content=body, status_code=status, media_type="application/json")
 
-    text = ""
-    blocks: List[Dict[str, Any]] = []
-    tables: List[Dict[str, Any]] = []
-    meta: Dict[str, Any] = {"engine": None}
 
-    if mime == "application/pdf":
-        doc = fitz.open(stream=file_bytes, filetype="pdf")
-        ratio = _page_text_ratio(doc)
-        is_digital = ratio > 0.1  # heuristic threshold
-
-        if is_digital:
-            meta["engine"] = "pymupdf"
-            parsed = _extract_digital_pdf(doc)
-            text = parsed["text"]
-            blocks = parsed["blocks"]
-            if want_tables:
-                tables = _extract_tables_plumber(file_bytes) if PLUMBER_OK else []
-        else:
-            meta["engine"] = "ocr"
-            parsed = _extract_scanned_pdf(doc)
-            text = parsed["text"]
-            blocks = parsed["blocks"]
-            # TODO: If you want OCR-based table detection, swap in PaddleOCR PP-Structure here.
-
-        response = ExtractResponse(
-            file_name=fname,
-            mime_type=mime,
-            pages=doc.page_count,
-            is_digital_pdf=is_digital,
-            text=text,
-            blocks=blocks,
-            tables=tables,
-            metadata=meta
-        )
-        return JSONResponse(response.dict())
+@app.post("/extract/stream")
+async def extract_stream(file: UploadFile = File(...), want_tables: Optional[bool] = Form(default=True)):
+    """Like /extract, but streams NDJSON records page by page as they are ready."""
+    fname = file.filename or "uploaded"
+    error = _extract_error(fname)
+    if error is not None:
+        return ORJSONResponse(status_code=error[0], content=error[1])
+    path, _, _ = await _spool_upload(file)
+    return StreamingResponse(_stream_extract(path, fname, bool(want_tables)), media_type="application/x-ndjson")
 
-    elif mime == "image":
-        # Direct image OCR
-        if not (PADDLE_OK or TESSERACT_OK):
-            return JSONResponse(status_code=500, content={"error": "No OCR engine available (install paddleocr or tesseract)."})
-        img = Image.open(io.BytesIO(file_bytes)).convert("RGB")
-        blk = _ocr_image_paddle(img) if PADDLE_OK else []
-        if not blk and TESSERACT_OK:
-            blk = _ocr_image_tesseract(img)
-        text = _merge_blocks_to_text(blk)
-        for b in blk:
-            b["page"] = 1
-        response = ExtractResponse(
-            file_name=fname, mime_type=mime, pages=1, is_digital_pdf=None,
-            text=text, blocks=blk, tables=[], metadata={"engine": "ocr"}
-        )
-        return JSONResponse(response.dict())
 
-    else:
-        return JSONResponse(status_code=400, content={"error": f"Unsupported file type for {fname}"})
+@app.post("/batch")
+async def extract_batch(files: List[UploadFile] = File(...), want_tables: Optional[bool] = Form(default=True)):
+    """Extract several files concurrently; streams one NDJSON result per file as each finishes."""
+    spooled = []
+    try:
+        for file in files:
+            path, digest, size = await _spool_upload(file)
+            spooled.append((file.filename or "uploaded", path, digest, size))
+    except BaseException:
+        # _stream_batch never runs, so it cannot clean up the files spooled so far
+        for _, path, _, _ in spooled:
+            _discard(path)
+        raise
+    return StreamingResponse(_stream_batch(spooled, bool(want_tables)), media_type="application/x-ndjson")
 
 
 if __name__ == "__main__":